@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 """Object to read lines from a stream using an arbitrary delimiter"""
-import math
 # from itertools import filterfalse
 # from unicodedata import combining, normalize
 
@@ -9,7 +8,7 @@ __all__ = ['ReadLines']
 
 
 # the default amount of data to read on a buffer full
-DEFAULT_BLOCK_SIZE = 1048756
+DEFAULT_BLOCK_SIZE = 1 << 20
 
 
 # # the size to read when scanning for a non-combining character
@@ -130,6 +129,10 @@ class StreamExhausted(Exception): # pylint: disable=too-few-public-methods
 
 class ReadLines:        # pylint: disable=too-many-instance-attributes
     """Iterator to read lines from a stream using an arbitrary delimiter"""
+    __slots__ = ('_buf', '_idx', '_eof', '_binary', '_empty_buf', '_read',
+                 '_block_size', '_delimiter', '_delimiter_length',
+                 'strip_delimiter', '_line', '_delimiter_pos')
+
     def peek(self, size=None):
         """Peek into the stream/buffer without advancing the current read
         state
@@ -162,18 +165,19 @@ class ReadLines:        # pylint: disable=too-many-instance-attributes
         # truncate the buffer
         buf, eof = self._buf[self._idx:], self._eof
 
-        fobj_read = self._fobj.read
+        fobj_read = self._read
         block_size = self._block_size
 
         # determine if more data is needed to satisfy the request
         extra_needed = size - len(buf)
 
         # while the steam has not been exhausted and more data is needed...
-        while not eof and extra_needed:
+        while not eof and extra_needed > 0:
 
             # determine how much data to read(in multiples of the block
-            # size) in order to satisfy the request
-            to_read = math.ceil(extra_needed / block_size) * block_size
+            # size) in order to satisfy the request; integer arithmetic
+            # avoids the float division of math.ceil()
+            to_read = -(-extra_needed // block_size) * block_size
 
             tmp_buf = fobj_read(to_read)
             if tmp_buf:
@@ -229,15 +233,17 @@ class ReadLines:        # pylint: disable=too-many-instance-attributes
                 return line[:delimiter_pos]
             return line
 
-        # get the next line from the buffer/stream
-        line, delimiter_pos = self._get_next_line()
+        # get the next line from the buffer/stream; the position of the
+        # delimiter is left in the _delimiter_pos attribute
+        line = self._get_next_line()
+        delimiter_pos = self._delimiter_pos
 
         if consume:
             # if consume is True then this line will not be cached
-            self._line, self._delimiter_pos = None, None
+            self._delimiter_pos = None
         else:
             # cache the line
-            self._line, self._delimiter_pos = line, delimiter_pos
+            self._line = line
 
         if self.strip_delimiter:
             return line[:delimiter_pos]
@@ -248,16 +254,20 @@ class ReadLines:        # pylint: disable=too-many-instance-attributes
 
         Returns
         -------
-        A two-tuple of the next line in the stream and the index of where,
-        within the line, the delimiter starts if it is present or the length of
-        the line if it does not.
+        The next line in the stream
+
+        The index of where, within the line, the delimiter starts if it is
+        present or the length of the line if it does not is stored in the
+        _delimiter_pos attribute rather than returned with the line so that no
+        tuple is created for every line.
 
         This call will raise a StreamExhausted exception if there are no more
         lines to be read.
         """
-        fobj_read = self._fobj.read
+        fobj_read = self._read
         block_size = self._block_size
-        delimiter = self.delimiter
+        delimiter = self._delimiter
+        delimiter_length = self._delimiter_length
         buf, idx, eof = self._buf, self._idx, self._eof
 
         # searching starts at the idx
@@ -266,7 +276,7 @@ class ReadLines:        # pylint: disable=too-many-instance-attributes
         while True:
 
             # The delimiter is either str/bytes or a regex-like object
-            if isinstance(delimiter, (str, bytes)):
+            if delimiter_length is not None:
                 delimiter_start = buf.find(delimiter, search_idx)
 
                 if delimiter_start != -1:
@@ -274,14 +284,15 @@ class ReadLines:        # pylint: disable=too-many-instance-attributes
                     # delimiter starts to get the index of where it ends and
                     # the index attribute is set to indicate where in the
                     # buffer the next line begins
-                    self._idx = end = delimiter_start + len(delimiter)
-                    return buf[idx:end], delimiter_start - idx
+                    self._idx = end = delimiter_start + delimiter_length
+                    self._delimiter_pos = delimiter_start - idx
+                    return buf[idx:end]
 
                 # a match was not found but if the delimiter is more than one
                 # character then the delimiter could have been split so an
                 # offset is provided to start the search within the existing
                 # buffer
-                search_offset = len(delimiter) - 1
+                search_offset = delimiter_length - 1
 
             else:
                 result = delimiter.search(buf, # pylint: disable=no-member
@@ -298,7 +309,8 @@ class ReadLines:        # pylint: disable=too-many-instance-attributes
                         # the index attribute is set to indicate where in the
                         # buffer the next line begins
                         self._idx = end
-                        return buf[idx:end], delimiter_start - idx
+                        self._delimiter_pos = delimiter_start - idx
+                        return buf[idx:end]
 
                     # if the match is at the end of the buffer then reading
                     # more could result in a better match if the regex is
@@ -332,7 +344,8 @@ class ReadLines:        # pylint: disable=too-many-instance-attributes
                         # final line contains no delimiter
                         delimiter_start = end
 
-                    return buf[idx:end], delimiter_start - idx
+                    self._delimiter_pos = delimiter_start - idx
+                    return buf[idx:end]
 
                 raise StreamExhausted
 
@@ -358,7 +371,6 @@ class ReadLines:        # pylint: disable=too-many-instance-attributes
     def delimiter(self):
         """Delimiter getter"""
         return self._delimiter
-    _delimiter = None
 
     @delimiter.setter
     def delimiter(self, value):
@@ -368,6 +380,7 @@ class ReadLines:        # pylint: disable=too-many-instance-attributes
                 raise ValueError('non-zero match delimiter is required')
             if isinstance(value, bytes) != self._binary:
                 raise ValueError('delimiter type must match stream mode')
+            delimiter_length = len(value)
         elif hasattr(value, 'search'):
             test_text = b'test' if self._binary else 'test'
             try:
@@ -376,9 +389,14 @@ class ReadLines:        # pylint: disable=too-many-instance-attributes
                 raise ValueError('delimiter type must match stream mode')
             if result and result.start() == result.end():
                 raise ValueError('non-zero match delimiter is required')
+            delimiter_length = None
         else:
             raise ValueError('unknown type of delimiter: {}'
                              .format(repr(value)))
+        # the length is kept with the delimiter so that the kind of delimiter
+        # and its length are not determined again on every search; it is None
+        # for a regex
+        self._delimiter_length = delimiter_length
         self._delimiter = value
 
     def __init__(self, fobj, *, delimiter='\n', strip_delimiter=False,
@@ -419,7 +437,7 @@ class ReadLines:        # pylint: disable=too-many-instance-attributes
         else:
             self._binary = False
             self._empty_buf = '' # pylint: disable=redefined-variable-type
-        self._fobj = fobj
+        self._read = fobj.read
         self.strip_delimiter = strip_delimiter
         self._block_size = block_size
         self.delimiter = delimiter
@@ -1,108 +1,215 @@
 #!/usr/bin/env python3
 """Combining wrapper"""
 import io
-from itertools import islice, repeat, takewhile, filterfalse
-from math import ceil
+import re
+from itertools import islice, repeat, takewhile
 from unicodedata import combining, normalize
 # import csv
 
 
+def _combining_class():
+    """Build a regex character class body covering every combining character"""
+    ranges = []
+    start = None
+    for code in range(0x110000):
+        if combining(chr(code)):
+            if start is None:
+                start = code
+        elif start is not None:
+            ranges.append((start, code - 1))
+            start = None
+    return ''.join(chr(first) if first == last else
+                   '{}-{}'.format(chr(first), chr(last))
+                   for first, last in ranges)
+
+
+# matches the first character that is not a combining character
+NONCOMBINING = re.compile('[^' + _combining_class() + ']')
+
+
 def buffer_fill_to_size(initial, fobj, size, eof, block_size=512):
     fobj_read = fobj.read
-    more = max(size - len(initial), 0)
+    parts = [initial]
+    length = len(initial)
+    more = max(size - length, 0)
     while not eof and more:
-        to_read = ceil(more / block_size) * block_size
+        to_read = -(-more // block_size) * block_size
         data = fobj_read(to_read)
         if data:
-            initial += data
-            more = max(size - len(initial), 0)
+            parts.append(data)
+            length += len(data)
+            more = max(size - length, 0)
         else:
             eof = True
-    return initial, eof
+    return initial[:0].join(parts), eof
 
 
 def buffer_fill_to_pred(initial, fobj, pred, eof, block_size=512):
     fobj_read = fobj.read
-    result = next(filter(lambda x: pred(x[1]), enumerate(initial)), None)
-    while result is None:
+
+    if hasattr(pred, 'search'):
+        # a regex, e.g. NONCOMBINING, is searched in C instead of calling a
+        # predicate for each character
+        def find(data):
+            result = pred.search(data)
+            return result.start() if result else None
+    else:
+        def find(data):
+            result = next(filter(lambda x: pred(x[1]), enumerate(data)), None)
+            return None if result is None else result[0]
+
+    parts = [initial]
+    length = 0                          # amount of data already scanned
+    data = initial
+    while True:
+        idx = find(data)
+        if idx is not None:
+            return initial[:0].join(parts), length + idx, eof
+        length += len(data)
         data = fobj_read(block_size)
         if not data:
-            return initial, len(initial), True
-        initial += data
-        result = next(filter(lambda x: pred(x[1]), enumerate(initial)), None)
-    return initial, result[0], eof
+            return initial[:0].join(parts), length, True
+        parts.append(data)
 
 
 class CombiningWrapper:
     """Combining wrapper"""
+    __slots__ = ('_read', '_form', '_block_size', '_buf', '_eof')
+    _empty = ''
+    # the type read from a stream opened in the wrong mode
+    _wrong_type = bytes
+    _wrong_mode = 'stream must be in text mode'
+
+    @staticmethod
+    def _find_boundary(data):
+        """Index of the first non-combining character in *data* or None"""
+        result = NONCOMBINING.search(data)
+        return result.start() if result else None
+
+    def _normalize(self, buf):
+        # every normalization form leaves ASCII unchanged and isascii() is a
+        # flag check on a str
+        form = self._form
+        if form is None or buf.isascii():
+            return buf
+        return normalize(form, buf)
+
     def readall(self):
-        fobj_read = self._fobj.read
-        buf = self._buf
-        self._buf = ''
+        fobj_read = self._read
+        parts = [self._buf]
+        self._buf = self._empty
         data = fobj_read()
         while data:
-            buf += data
+            parts.append(data)
             data = fobj_read()
-        form = self.form
-        if form is not None:
-            return normalize(form, buf)
-        return buf
+        return self._normalize(self._empty.join(parts))
 
     def read(self, size=-1):
         if size is None or size < 0:
             return self.readall()
 
+        empty = self._empty
         if size == 0:
-            return ''
+            return empty
 
-        fobj_read = self._fobj.read
+        fobj_read = self._read
         block_size = self._block_size
 
         buf, eof = self._buf, self._eof
 
-        more = max(size - len(buf), 0)
+        # data is accumulated in a list and joined once to avoid repeatedly
+        # copying the buffer
+        parts = [buf]
+        length = len(buf)
+
+        more = max(size - length, 0)
 
         while not eof and more:
 
-            to_read = ceil(more // block_size) * block_size
+            to_read = -(-more // block_size) * block_size
 
             data = fobj_read(to_read)
             if data:
-                buf += data
+                parts.append(data)
+                length += len(data)
 
-                more = max(size - len(buf), 0)
+                more = max(size - length, 0)
 
             else:
                 self._eof = eof = True
 
+        buf = empty.join(parts)
+
         extra = buf[size:]
         if not extra:
             extra = fobj_read(block_size)
-        buf = buf[:size]
+        parts = [buf[:size]]
+        find_boundary = self._find_boundary
         while extra:
-            result = next(filterfalse(lambda x: combining(x[1]),
-                                      enumerate(extra)), None)
-            if result is not None:
-                idx = result[0]
-                buf += extra[:idx]
+            idx = find_boundary(extra)
+            if idx is not None:
+                parts.append(extra[:idx])
                 self._buf = extra[idx:]
                 break
-            buf += extra
+            parts.append(extra)
             extra = fobj_read(block_size)
         else:
-            self._buf = ''
-        return buf
+            self._buf = empty
+        return self._normalize(empty.join(parts))
 
     def __init__(self, fobj, *, form=None, block_size=512):
-        self._fobj = fobj
+        self._read = fobj.read
         self._form = form
         self._block_size = block_size
         buf = fobj.read(1)
-        if isinstance(buf, bytes):
-            raise ValueError('stream must be in text mode')
+        if isinstance(buf, self._wrong_type):
+            raise ValueError(self._wrong_mode)
         self._buf, self._eof = buf, not buf
 
 
+# matches an ASCII byte or the lead byte of a multiple byte UTF-8 sequence
+UTF8_START = re.compile(b'[\x00-\x7f\xc0-\xff]')
+
+
+class CombiningWrapperBytes(CombiningWrapper):
+    """Combining wrapper for a binary stream of UTF-8 data
+
+    Boundaries are found on the raw bytes: an ASCII byte always starts a
+    non-combining character so only the lead bytes of multiple byte
+    sequences are decoded. Data is only decoded for normalization and then
+    only when it is not ASCII.
+    """
+    __slots__ = ()
+    _empty = b''
+    _wrong_type = str
+    _wrong_mode = 'stream must be in binary mode'
+
+    @staticmethod
+    def _find_boundary(data):
+        """Index of the first non-combining character in *data* or None"""
+        for result in UTF8_START.finditer(data):
+            idx = result.start()
+            lead = data[idx]
+            if lead < 0x80:
+                return idx
+            length = 2 if lead < 0xe0 else 3 if lead < 0xf0 else 4
+            if idx + length > len(data):
+                return None             # the sequence is split between reads
+            try:
+                char = data[idx:idx + length].decode('utf-8')
+            except UnicodeDecodeError:
+                return idx              # invalid data is never combined
+            if not combining(char):
+                return idx
+        return None
+
+    def _normalize(self, buf):
+        form = self._form
+        if form is None or buf.isascii():
+            return buf
+        return normalize(form, buf.decode('utf-8')).encode('utf-8')
+
+
 # a = io.StringIO('oo\u0308\u0308\u0308o\u0308\u0308')
 # o = CombiningWrapper(a)
 # form = 'NFD'
@@ -1,8 +1,7 @@
 # -*- coding: utf-8 -*-
 "Miscellaneous I/O utilies"
 from .open import open_file
-from .readlines import ReadLines
-from .normalizer import NormalizedReader
+from .readlines import ReadLines, iter_lines
 
 
 version = '4.0.0'                       # pylint: disable=invalid-name
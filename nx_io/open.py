@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Open a file named by any of the supported path types"""
+import os
+
+
+__all__ = ['open_file']
+
+
+def open_file(file_name, *args, **kwargs):
+    """Open a file
+
+    Arguments
+    ---------
+    file_name : str, bytes, integer, or path-like object
+                The file to open
+    args      : Positional arguments passed on to open()
+    kwargs    : Keyword arguments passed on to open()
+
+    Returns
+    -------
+    The file object returned by open()
+
+    An integer *file_name* is treated as a file descriptor. Any other value is
+    resolved with os.fspath() which accepts str, bytes, and objects that
+    implement the PEP 519 __fspath__() protocol, e.g. pathlib.Path, and raises
+    TypeError for everything else, e.g. an already opened file object.
+    """
+    if isinstance(file_name, int):
+        return open(file_name, *args, **kwargs)
+    return open(os.fspath(file_name), *args, **kwargs)
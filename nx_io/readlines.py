@@ -1,17 +1,159 @@
 # -*- coding: utf-8 -*-
 """Object to read lines from a stream using an arbitrary delimiter"""
-from math import ceil
+import os
+import re
+import stat
+from queue import Full, Queue
+from threading import Event, Thread
+from weakref import finalize
+
+
+__all__ = ['ReadLines', 'iter_lines']
+
+
+# the default amount of data to read on a buffer fill, 1 MiB; a power of two
+# keeps reads of regular files aligned to the file system block size
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+# the largest read made when the read size grows while searching for the end
+# of a long line; the read size only grows for regular files and in memory
+# streams as a larger read from a pipe waits for more data before returning
+MAX_READ_SIZE = 64 << 20
+
+
+def _readinto_reader(readinto, block_size):
+    """Make a read function that reuses a single buffer
+
+    Arguments
+    ---------
+    readinto   : callable
+                 The readinto method of a binary stream
+    block_size : integer
+                 Size of the reused buffer
+
+    Returns
+    -------
+    A function that is called like read() but returns a memoryview of the
+    reused buffer, which is only valid until the next call. At most
+    *block_size* bytes are returned per call. The buffer is released once the
+    stream is exhausted.
+    """
+    view = memoryview(bytearray(block_size))
+
+    def read(size):
+        """Read upto *size* bytes into the reused buffer"""
+        nonlocal view
+        if view is None:
+            return b''
+        amount = readinto(view[:size])
+        if amount:
+            return view[:amount]
+        if amount is None:
+            # a non-blocking stream has no data available right now, which
+            # must not be mistaken for the end of the stream
+            raise BlockingIOError('no data available from a non-blocking '
+                                  'stream')
+        view = None
+        return b''
+
+    return read
+
+
+# the number of blocks a prefetching reader may read ahead
+PREFETCH_DEPTH = 2
+
+# the number of seconds a prefetching thread waits on a full queue before it
+# checks whether its reader has been dropped
+PREFETCH_POLL = 0.1
+
+
+def _prefetch(read, block_size, queue, stop):
+    """Read blocks into *queue* until the stream is exhausted or *stop* is set
+
+    The thread running this holds no reference to the reader so that dropping
+    the reader sets *stop*. Something is always queued for a failed read so
+    the consumer is never left waiting.
+    """
+    while not stop.is_set():
+        try:
+            data = read(block_size)
+        except BaseException as exc: # pylint: disable=broad-except
+            data = exc
+        while True:
+            try:
+                queue.put(data, timeout=PREFETCH_POLL)
+                break
+            except Full:
+                if stop.is_set():
+                    return
+        if isinstance(data, BaseException) or not data:
+            return
 
 
-__all__ = ['ReadLines']
+class _Prefetcher:              # pylint: disable=too-few-public-methods
+    """Read blocks from a stream in a background thread"""
+    def read(self, size):       # pylint: disable=unused-argument
+        """Get the next block read from the stream
 
+        Arguments
+        ---------
+        size : integer
+               The amount of data requested
+
+        Returns
+        -------
+        The next block from the stream. Blocks are read ahead of time using the
+        block size given at construction so *size* is ignored; ReadLines never
+        requests less than a block so at worst this is a short read.
+
+        An exception raised by the stream is raised here, in the consuming
+        thread, and on every subsequent call.
+        """
+        if self._done:
+            if self._error is not None:
+                raise self._error
+            return self._empty
+
+        data = self._queue.get()
+        if isinstance(data, BaseException):
+            self._done = True
+            self._error = data
+            raise data
+        if not data:
+            self._done = True
+            self._empty = data
+        return data
+
+    def __init__(self, read, block_size):
+        """
+        Arguments
+        ---------
+        read       : callable
+                     The read method of the stream
+        block_size : integer
+                     Size to use for reading from the stream
 
-# the default amount of data to read on a buffer fill
-DEFAULT_BLOCK_SIZE = 1048756
+        The thread is told to stop once this object is garbage collected; it
+        exits when its current read returns.
+        """
+        self._queue = Queue(PREFETCH_DEPTH)
+        self._done = False
+        self._error = None
+        self._empty = None
+        stop = Event()
+        finalize(self, stop.set)
+        Thread(target=_prefetch, args=(read, block_size, self._queue, stop),
+               daemon=True).start()
 
 
 class ReadLines: # pylint: disable=too-few-public-methods, too-many-instance-attributes
     """Iterator to read lines from a stream using an arbitrary delimiter"""
+    # the state used on every line is listed first
+    __slots__ = ('_buf', '_idx', '_eof', '_binary', '_delimiter',
+                 '_delimiter_length', '_delimiter_search', 'strip_delimiter',
+                 '_read', '_block_size', '_max_read_size', '_empty',
+                 '__weakref__')
+
     def peek(self, size=None):
         """Peek into the stream/buffer without advancing the current state
 
@@ -36,6 +178,7 @@ class ReadLines: # pylint: disable=too-few-public-methods, too-many-instance-att
 
         buf = self._buf
         idx = self._idx
+        binary = self._binary
 
         if not self._eof and len(buf) - idx < size:
             # the stream is not known to be exhausted and the existing buffer
@@ -54,19 +197,83 @@ class ReadLines: # pylint: disable=too-few-public-methods, too-many-instance-att
             while amount_needed > 0:
 
                 # read in the number of blocks necessary to fulfill the request
-                data = read(ceil(amount_needed / block_size) * block_size)
+                data = read(-(-amount_needed // block_size) * block_size)
                 if not data:
                     self._eof = True
                     break
 
+                # the data read from a binary stream may be a view that is
+                # only valid until the next read so it is copied immediately
+                if binary:
+                    data = bytes(data)
                 chunks.append(data)
                 amount_needed = max(amount_needed - len(data), 0)
 
-            buf += self._empty.join(chunks)
+            if chunks:
+                buf += self._empty.join(chunks)
             self._buf = buf
 
         return buf[idx:idx + size]
 
+    def count_remaining(self):
+        """Count and consume the remaining lines
+
+        Returns
+        -------
+        The number of lines that iterating over the rest of the stream would
+        return
+
+        A single character delimiter is counted block by block with the count()
+        method of the buffer so that no line objects are created. A longer
+        fixed delimiter is counted by splitting each block, which creates an
+        object per line but matches left to right as iterating does when
+        occurrences of the delimiter overlap. A regex delimiter is counted by
+        iterating.
+        """
+        delimiter = self._delimiter
+        delimiter_length = self._delimiter_length
+
+        if not delimiter_length:
+            return sum(1 for _ in self)
+
+        read = self._read
+        block_size = self._block_size
+        buf = self._buf[self._idx:]
+        eof = self._eof
+
+        count = 0
+        pending = False                 # data follows the last delimiter
+
+        while True:
+            if delimiter_length == 1:
+                found = buf.count(delimiter)
+                tail = buf.rfind(delimiter) + 1
+            else:
+                # the searches for a multiple character delimiter must agree
+                # with the left to right matching used for iteration, which
+                # rfind() does not do for delimiters that can overlap
+                parts = buf.split(delimiter)
+                found = len(parts) - 1
+                tail = len(buf) - len(parts[-1])
+            count += found
+            if buf:
+                pending = tail < len(buf)
+
+            if eof:
+                break
+            more = read(block_size)
+            if not more:
+                break
+
+            # only the part of the buffer that may hold the start of a
+            # delimiter split between reads is kept
+            buf = buf[max(tail, len(buf) - delimiter_length + 1):] + more
+
+        self._buf = self._buf[:0]
+        self._idx = 0
+        self._eof = True
+        return count + pending
+
     def __iter__(self):
         return self
 
@@ -85,16 +292,17 @@ class ReadLines: # pylint: disable=too-few-public-methods, too-many-instance-att
         """
         buf = self._buf
         eof = self._eof
-        delimiter = self.delimiter
-        read = self._read
-        block_size = self._block_size
+        binary = self._binary
+        delimiter = self._delimiter
+        delimiter_length = self._delimiter_length
+        delimiter_search = self._delimiter_search
 
         # searching starts at the idx
         search_idx = idx = self._idx
+        read_size = 0
+        refills = 0
 
-        delimiter_is_fixed = isinstance(delimiter, (str, bytes))
-        if delimiter_is_fixed:
-            delimiter_length = len(delimiter)
+        if delimiter_length is not None:
             # if a match is not found then the buffer is expanded and another
             # search is performed starting with the new data
             # if the delimiter has multiple characters then the possibility
@@ -107,8 +315,12 @@ class ReadLines: # pylint: disable=too-few-public-methods, too-many-instance-att
                             .format(delimiter.__class__))
 
         while True:
-            if delimiter_is_fixed:
-                delimiter_start = buf.find(delimiter, search_idx)
+            if delimiter_length is not None:
+                if delimiter_search is None:
+                    delimiter_start = buf.find(delimiter, search_idx)
+                else:
+                    result = delimiter_search(buf, search_idx)
+                    delimiter_start = result.start() if result else -1
 
                 if delimiter_start != -1:
                     # the length of the delimiter is added to where the
@@ -158,19 +370,46 @@ class ReadLines: # pylint: disable=too-few-public-methods, too-many-instance-att
 
                 raise StopIteration
 
-            # truncate the buffer
-            buf = buf[idx:]
-            idx = 0
-
             # searching should commence with the new data that will be added
-            # to the buffer minus any offset that was previously provided
-            search_idx = max(len(buf) - search_offset, 0)
-
-            # get more data
-            more = read(block_size)
+            # to the truncated buffer minus any offset that was previously
+            # provided
+            search_idx = max(len(buf) - idx - search_offset, 0)
+
+            # get more data; the read attributes are only looked up here so
+            # that a line found in the existing buffer does not pay for them
+            # each further read for the same line requests double the previous
+            # amount so that a text line spanning many blocks is not copied
+            # into a new buffer for every block
+            if read_size:
+                read_size = max(min(read_size * 2, self._max_read_size),
+                                read_size)
+            else:
+                read_size = self._block_size
+            more = self._read(read_size)
             if not more:
                 self._eof = eof = True
-            buf += more
+
+            # truncate the buffer and add the new data; the first refill of a
+            # binary line joins the unconsumed data and the new data with a
+            # single copy and if the line spans further blocks it is gathered
+            # in a bytearray that is extended in place
+            if not binary:
+                buf = buf[idx:] + more
+                self._buf = buf
+            elif not refills:
+                buf = self._empty.join((memoryview(buf)[idx:], more))
+            elif refills == 1:
+                buf = bytearray(buf)
+                buf += more
+            else:
+                buf += more
+            refills += 1
+            idx = 0
+
+        if binary and refills:
+            # the line has been found so a bytearray is converted back once
+            if refills > 1:
+                buf = bytes(buf)
             self._buf = buf
 
         # set the _idx attribute to the end of the line being returned if it is
@@ -183,8 +422,31 @@ class ReadLines: # pylint: disable=too-few-public-methods, too-many-instance-att
         return buf[idx:end]
     # pylint: enable=too-many-branches,too-many-locals
 
+    @property
+    def delimiter(self):
+        """Delimiter getter"""
+        return self._delimiter
+
+    @delimiter.setter
+    def delimiter(self, value):
+        """Delimiter setter"""
+        # the kind of delimiter is determined once when it is set rather than
+        # on every search; the length is None for a regex delimiter
+        if isinstance(value, (str, bytes)):
+            self._delimiter_length = len(value)
+            # a literal pattern is found faster by the regex engine than by
+            # find() once the delimiter has more than one character
+            if len(value) > 1:
+                self._delimiter_search = re.compile(re.escape(value)).search
+            else:
+                self._delimiter_search = None
+        else:
+            self._delimiter_length = None
+            self._delimiter_search = None
+        self._delimiter = value
+
     def __init__(self, fobj, *, delimiter='\n', strip_delimiter=False,
-                 block_size=DEFAULT_BLOCK_SIZE):
+                 block_size=DEFAULT_BLOCK_SIZE, prefetch=False):
         """
         Arguments
         ----------
@@ -197,6 +459,9 @@ class ReadLines: # pylint: disable=too-few-public-methods, too-many-instance-att
                           in a returned line
         block_size      : integer
                           Size to use for reading from the stream
+        prefetch        : boolean
+                          Indicator on whether blocks should be read ahead in
+                          a background thread
 
         Attributes
         ----------
@@ -209,8 +474,9 @@ class ReadLines: # pylint: disable=too-few-public-methods, too-many-instance-att
         The stream must be opened for reading and should be blocking.
 
         The *delimiter* type should match the mode of *fobj*. If *delimiter* is
-        str/bytes then the find() method of the internal buffer will be used.
-        If *delimiter* is regex then its search() method will be used.
+        a single character str/bytes then the find() method of the internal
+        buffer will be used and a longer one is searched for as a literal
+        regex. If *delimiter* is regex then its search() method will be used.
 
         The *delimiter* should match one or more characters.
 
@@ -219,13 +485,105 @@ class ReadLines: # pylint: disable=too-few-public-methods, too-many-instance-att
         match as much as possible, as would be necessary if matching text is
         split between blocks, caution is advised in using regular expressions
         that assume all of the text is present during a search.
+
+        With *prefetch*, a daemon thread reads up to PREFETCH_DEPTH blocks
+        ahead so that reading the stream overlaps with searching. The stream
+        must not be used by anything else while the ReadLines instance is in
+        use. The thread keeps a reference to the stream until it has been
+        exhausted or the ReadLines instance has been dropped.
         """
         self._read = fobj.read
         self.delimiter = delimiter
         self.strip_delimiter = strip_delimiter
         self._block_size = block_size
+        self._max_read_size = MAX_READ_SIZE
+        try:
+            fileno = fobj.fileno()
+        except (AttributeError, OSError, ValueError):
+            fileno = None
+        if fileno is not None:
+            if not stat.S_ISREG(os.fstat(fileno).st_mode):
+                # a pipe, socket or terminal is always read a block at a time
+                self._max_read_size = block_size
+            try:
+                # let the kernel know the file is read sequentially so that it
+                # reads further ahead; platforms without posix_fadvise() are
+                # left as is
+                os.posix_fadvise(fileno, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except (AttributeError, OSError):
+                pass
         buf = fobj.read(block_size)
-        self._empty = b'' if isinstance(buf, bytes) else ''
+        if isinstance(buf, bytes):
+            self._binary = True
+            self._empty = b''
+        else:
+            self._binary = False
+            self._empty = ''
         self._buf = buf
         self._idx = 0
         self._eof = not buf
+        if prefetch and buf:
+            self._read = _Prefetcher(fobj.read, block_size).read
+        elif (self._binary and len(buf) == block_size and
+              hasattr(fobj, 'readinto')):
+            # read binary data into a reused buffer rather than allocating a
+            # new bytes object for every block that is then copied again; a
+            # stream that did not fill the first block is too small to make
+            # allocating the buffer worthwhile
+            self._read = _readinto_reader(fobj.readinto, block_size)
+
+
+def iter_lines(fobj, *, delimiter='\n', strip_delimiter=False,
+               block_size=DEFAULT_BLOCK_SIZE):
+    """Generate the lines of a stream using an arbitrary delimiter
+
+    Arguments
+    ---------
+    fobj            : stream
+                      Stream from which to read
+    delimiter       : str, bytes, or regex
+                      Criteria for how a line is terminated
+    strip_delimiter : boolean
+                      Indicator on whether the delimiter should be included in
+                      a returned line
+    block_size      : integer
+                      Size to use for reading from the stream
+
+    Returns
+    -------
+    A generator of the lines in the stream, the same lines that iterating a
+    ReadLines instance would return
+
+    This is for when the lines are only iterated: the delimiter cannot be
+    changed and there is no peek(). For a str/bytes delimiter the lines held
+    whole in the buffer of a ReadLines instance are split off here with the
+    search state kept in local variables so that no attribute is accessed for
+    each line. A line that spans blocks, and any other delimiter, is handed
+    off to the ReadLines instance.
+    """
+    rdr = ReadLines(fobj, delimiter=delimiter, strip_delimiter=strip_delimiter,
+                    block_size=block_size)
+    if not isinstance(delimiter, (str, bytes)) or not delimiter:
+        yield from rdr
+        return
+
+    delimiter_length = len(delimiter)
+    keep = 0 if strip_delimiter else delimiter_length
+
+    # pylint: disable=protected-access
+    while True:
+        buf = rdr._buf
+        idx = rdr._idx
+        delimiter_start = buf.find(delimiter, idx)
+        while delimiter_start != -1:
+            yield buf[idx:delimiter_start + keep]
+            idx = delimiter_start + delimiter_length
+            delimiter_start = buf.find(delimiter, idx)
+        rdr._idx = idx
+
+        # the rest of the buffer does not hold a whole line so ReadLines
+        # refills it
+        line = next(rdr, None)
+        if line is None:
+            return
+        yield line
@@ -23,11 +23,18 @@ setup(name=name,
           'Development Status :: 5 - Production/Stable',
           'License :: OSI Approved :: MIT License',
           'Programming Language :: Python :: 3 :: Only',
+          'Programming Language :: Python :: 3.6',
+          'Programming Language :: Python :: 3.7',
+          'Programming Language :: Python :: 3.8',
+          'Programming Language :: Python :: 3.9',
+          'Programming Language :: Python :: 3.10',
+          'Programming Language :: Python :: 3.11',
           'Topic :: Software Development :: Libraries',
           'Topic :: Utilities',
           'Intended Audience :: Developers'],
       keywords='development utilities io readline',
       packages=find_packages(),
+      python_requires='>=3.6',
       package_data={
           name: ['version.txt']},
       setup_requires=['pytest-runner'],
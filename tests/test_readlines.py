@@ -1,10 +1,42 @@
 # -*- coding: utf-8 -*-
 "Tests for nx_io.readlines"
+import gc
 import io
+import os
 import re
+import threading
+import tracemalloc
+import weakref
 from collections.abc import Iterator
+from functools import lru_cache
+from itertools import zip_longest
 import pytest
-from nx_io import ReadLines
+from nx_io import ReadLines, iter_lines
+
+
+# ReadLines is an iterator; checked once rather than for every instance
+assert issubclass(ReadLines, Iterator)
+
+
+# regex delimiters shared by the tests
+RE_TILDE_TXT = re.compile(r'~')
+RE_TILDE_BIN = re.compile(b'~')
+RE_TILDE_RUN_TXT = re.compile(r'~+')
+RE_TILDE_ANY_TXT = re.compile(r'~*')
+RE_BANG_TXT = re.compile(r'!')
+RE_BANG_AT_TXT = re.compile(r'!@')
+RE_BANG_AT_BIN = re.compile(b'!@')
+RE_T_RUN_TXT = re.compile(r't+')
+RE_T_RUN_BIN = re.compile(b't+')
+
+
+def encode(text):
+    """Encode text for a binary stream"""
+    return text.encode('utf-8')
+
+
+# the stream and data constructors keyed by the type of the delimiter text
+CTORS = {str: (io.StringIO, str), bytes: (io.BytesIO, encode)}
 
 
 def get_instance(fobj, delimiter, **kwargs):
@@ -13,326 +45,178 @@ def get_instance(fobj, delimiter, **kwargs):
         rdr = ReadLines(fobj, **kwargs)
     else:
         rdr = ReadLines(fobj, delimiter=delimiter, **kwargs)
-    assert isinstance(rdr, Iterator)
     assert delimiter is None or rdr.delimiter is delimiter
     return rdr
 
 
+def assert_lines(rdr, expected):
+    """Assert that iterating *rdr* returns the *expected* lines
+
+    The lines are compared as they are returned so that a mismatch is
+    reported with its position without first reading the rest of the stream.
+    """
+    missing = object()
+    for idx, (line, expected_line) in enumerate(zip_longest(rdr, expected,
+                                                            fillvalue=missing)):
+        assert line == expected_line, 'line {}'.format(idx)
+
+
 def null_tests(delimiter_txt, delimiter, **kwargs):
     """Run tests with no delimiter in the stream"""
-    if isinstance(delimiter_txt, str):
-        fobj_ctor = io.StringIO
-        data_ctor = lambda x: x
-    else:
-        fobj_ctor = io.BytesIO
-        data_ctor = lambda x: x.encode('utf-8')
+    fobj_ctor, data_ctor = CTORS[type(delimiter_txt)]
 
     # test with no delimiter in data
     assert delimiter_txt != data_ctor('abc')
     fobj = fobj_ctor(data_ctor('abc'))
     rdr = get_instance(fobj, delimiter, **kwargs)
-    assert list(rdr) == [data_ctor('abc')]
+    assert_lines(rdr, [data_ctor('abc')])
 
     # test with no data
     fobj = fobj_ctor(data_ctor(''))
     rdr = get_instance(fobj, delimiter, **kwargs)
-    assert list(rdr) == []
-
-
-def std_tests(delimiter_txt, delimiter=None, eats_run=False, **kwargs):
-    """Run standard delimiter tests"""
-    if isinstance(delimiter_txt, str):
-        fobj_ctor = io.StringIO
-        data_ctor = lambda x: x
-    else:
-        fobj_ctor = io.BytesIO
-        data_ctor = lambda x: x.encode('utf-8')
-
-    null_tests(delimiter_txt, delimiter, **kwargs)
-
-    # test with just the delimiter as data
-    fobj = fobj_ctor(delimiter_txt)
-    rdr = get_instance(fobj, delimiter, **kwargs)
-    assert list(rdr) == [delimiter_txt]
+    assert_lines(rdr, [])
 
-    # test with multiple delimiters only as data
-    fobj = fobj_ctor(delimiter_txt * 3)
-    if eats_run:
-        expected = [delimiter_txt * 3]
-    else:
-        expected = [delimiter_txt] * 3
-    rdr = get_instance(fobj, delimiter, **kwargs)
-    assert list(rdr) == expected
 
-    # test with delimiter and text where there is no delimiter at either end
-    base_str = data_ctor('abc') + delimiter_txt + data_ctor('def') + \
-               (delimiter_txt * 2) + data_ctor('ghi')
-    if eats_run:
-        expected = [data_ctor('abc') + delimiter_txt, data_ctor('def') + \
-                    (delimiter_txt * 2), data_ctor('ghi')]
-    else:
-        expected = [data_ctor('abc') + delimiter_txt, data_ctor('def') + \
-                    delimiter_txt, delimiter_txt, data_ctor('ghi')]
-    fobj = fobj_ctor(base_str)
-    rdr = get_instance(fobj, delimiter, **kwargs)
-    assert list(rdr) == expected
+@lru_cache(maxsize=None)
+def std_cases(delimiter_txt, eats_run, strip):
+    """Build the standard tests as (data, expected lines) pairs
 
-    # test with delimiter and text where the delimiter is at both ends
-    base_str = delimiter_txt + base_str + delimiter_txt
-    expected = [delimiter_txt] + expected
-    expected[-1] = expected[-1] + delimiter_txt
-    fobj = fobj_ctor(base_str)
-    rdr = get_instance(fobj, delimiter, **kwargs)
-    assert list(rdr) == expected
+    The pairs are only built once for each combination and the expected lines
+    are tuples so that they cannot be modified by a test.
+    """
+    data_ctor = CTORS[type(delimiter_txt)][1]
 
+    def line(text, delimiters):
+        """A line of *text* that is ended by *delimiters*"""
+        return data_ctor(text) + (data_ctor('') if strip else delimiters)
 
-def std_tests_strip(delimiter_txt, delimiter=None, eats_run=False, **kwargs):
-    """Run standard delimiter tests with stripped delimiters"""
-    if isinstance(delimiter_txt, str):
-        fobj_ctor = io.StringIO
-        data_ctor = lambda x: x
-    else:
-        fobj_ctor = io.BytesIO
-        data_ctor = lambda x: x.encode('utf-8')
-
-    kwargs['strip_delimiter'] = True
-
-    null_tests(delimiter_txt, delimiter, **kwargs)
+    cases = []
 
     # test with just the delimiter as data
-    fobj = fobj_ctor(delimiter_txt)
-    rdr = get_instance(fobj, delimiter, **kwargs)
-    assert list(rdr) == [data_ctor('')]
+    cases.append((delimiter_txt, (line('', delimiter_txt),)))
 
     # test with multiple delimiters only as data
-    fobj = fobj_ctor(delimiter_txt * 3)
     if eats_run:
-        expected = [data_ctor('')]
+        expected = (line('', delimiter_txt * 3),)
     else:
-        expected = [data_ctor('')] * 3
-    rdr = get_instance(fobj, delimiter, **kwargs)
-    assert list(rdr) == expected
+        expected = (line('', delimiter_txt),) * 3
+    cases.append((delimiter_txt * 3, expected))
 
     # test with delimiter and text where there is no delimiter at either end
     base_str = data_ctor('abc') + delimiter_txt + data_ctor('def') + \
                (delimiter_txt * 2) + data_ctor('ghi')
     if eats_run:
-        expected = [data_ctor('abc'), data_ctor('def'), data_ctor('ghi')]
+        expected = (line('abc', delimiter_txt), line('def', delimiter_txt * 2),
+                    data_ctor('ghi'))
     else:
-        expected = [data_ctor('abc'), data_ctor('def'), data_ctor(''),
-                    data_ctor('ghi')]
-    fobj = fobj_ctor(base_str)
-    rdr = get_instance(fobj, delimiter, **kwargs)
-    assert list(rdr) == expected
+        expected = (line('abc', delimiter_txt), line('def', delimiter_txt),
+                    line('', delimiter_txt), data_ctor('ghi'))
+    cases.append((base_str, expected))
 
     # test with delimiter and text where the delimiter is at both ends
-    base_str = delimiter_txt + base_str + delimiter_txt
-    expected = [data_ctor('')] + expected
-    fobj = fobj_ctor(base_str)
-    rdr = get_instance(fobj, delimiter, **kwargs)
-    assert list(rdr) == expected
-
-
-def test_newline_text():
-    """Test with newline delimiter - default and explicit"""
-    std_tests('\n')
-    std_tests('\n', '\n')
-    std_tests('\n', block_size=1)
-    std_tests('\n', '\n', block_size=1)
-
-
-def test_newline_text_strip():
-    """Test with newline delimiter - default and explicit"""
-    std_tests_strip('\n')
-    std_tests_strip('\n', '\n')
-    std_tests_strip('\n', block_size=1)
-    std_tests_strip('\n', '\n', block_size=1)
-
-
-def test_single_text():
-    """Test with single character delimiter"""
-    std_tests('~', '~')
-    std_tests('~', '~', block_size=1)
-
-
-def test_single_text_strip():
-    """Test with single character delimiter"""
-    std_tests_strip('~', '~')
-    std_tests_strip('~', '~', block_size=1)
-
-
-def test_multi_text():
-    """Test with multiple character delimiter"""
-    std_tests('!@', '!@')
-    std_tests('!@', '!@', block_size=1)
-
-
-def test_multi_text_strip():
-    """Test with multiple character delimiter"""
-    std_tests_strip('!@', '!@')
-    std_tests_strip('!@', '!@', block_size=1)
-
-
-def test_newline_bin():
-    """Test with newline delimiter"""
-    std_tests(b'\n', b'\n')
-    std_tests(b'\n', b'\n', block_size=1)
-
-
-def test_newline_bin_strip():
-    """Test with newline delimiter"""
-    std_tests_strip(b'\n', b'\n')
-    std_tests_strip(b'\n', b'\n', block_size=1)
-
-
-def test_single_bin():
-    """Test with single character delimiter"""
-    std_tests(b'~', b'~')
-    std_tests(b'~', b'~', block_size=1)
-
-
-def test_single_bin_strip():
-    """Test with single character delimiter"""
-    std_tests_strip(b'~', b'~')
-    std_tests_strip(b'~', b'~', block_size=1)
-
-
-def test_multi_bin():
-    """Test with multiple character delimiter"""
-    std_tests(b'!@', b'!@')
-    std_tests(b'!@', b'!@', block_size=1)
-
-
-def test_multi_bin_strip():
-    """Test with multiple character delimiter"""
-    std_tests_strip(b'!@', b'!@')
-    std_tests_strip(b'!@', b'!@', block_size=1)
-
-
-def test_single_regex_text():
-    """Test with single character regex delimiter"""
-    std_tests('~', re.compile(r'~'))
-    std_tests('~', re.compile(r'~'), block_size=1)
-
-
-def test_single_regex_text_strip():
-    """Test with single character regex delimiter"""
-    std_tests_strip('~', re.compile(r'~'))
-    std_tests_strip('~', re.compile(r'~'), block_size=1)
-
-
-def test_multi_regex_text():
-    """Test with multiple character regex delimiter"""
-    std_tests('!@', re.compile(r'!@'))
-    std_tests('!@', re.compile(r'!@'), block_size=1)
+    cases.append((delimiter_txt + base_str + delimiter_txt,
+                  (line('', delimiter_txt),) + expected[:-1] +
+                  (line('ghi', delimiter_txt),)))
 
+    return tuple(cases)
 
-def test_multi_regex_text_strip():
-    """Test with multiple character regex delimiter"""
-    std_tests_strip('!@', re.compile(r'!@'))
-    std_tests_strip('!@', re.compile(r'!@'), block_size=1)
 
+def std_tests(delimiter_txt, delimiter=None, eats_run=False, **kwargs):
+    """Run standard delimiter tests"""
+    fobj_ctor = CTORS[type(delimiter_txt)][0]
 
-def test_greedy_regex_text():
-    """Test with greedy character regex delimiter"""
-    std_tests('t', re.compile(r't+'), eats_run=True)
-    std_tests('ttt', re.compile(r't+'), eats_run=True)
-    std_tests('tttttt', re.compile(r't+'), eats_run=True)
-    std_tests('t', re.compile(r't+'), eats_run=True, block_size=1)
-    std_tests('ttt', re.compile(r't+'), eats_run=True, block_size=1)
-    std_tests('tttttt', re.compile(r't+'), eats_run=True, block_size=1)
-
-
-def test_greedy_regex_text_strip():
-    """Test with greedy character regex delimiter"""
-    std_tests_strip('t', re.compile(r't+'), eats_run=True)
-    std_tests_strip('ttt', re.compile(r't+'), eats_run=True)
-    std_tests_strip('tttttt', re.compile(r't+'), eats_run=True)
-    std_tests_strip('t', re.compile(r't+'), eats_run=True, block_size=1)
-    std_tests_strip('ttt', re.compile(r't+'), eats_run=True, block_size=1)
-    std_tests_strip('tttttt', re.compile(r't+'), eats_run=True, block_size=1)
-
-
-def test_single_regex_bin():
-    """Test with single character regex delimiter"""
-    std_tests(b'~', re.compile(b'~'))
-    std_tests(b'~', re.compile(b'~'), block_size=1)
-
-
-def test_single_regex_bin_strip():
-    """Test with single character regex delimiter"""
-    std_tests_strip(b'~', re.compile(b'~'))
-    std_tests_strip(b'~', re.compile(b'~'), block_size=1)
-
-
-def test_multi_regex_bin():
-    """Test with multiple character regex delimiter"""
-    std_tests(b'!@', re.compile(b'!@'))
-    std_tests(b'!@', re.compile(b'!@'), block_size=1)
-
-
-def test_multi_regex_bin_strip():
-    """Test with multiple character regex delimiter"""
-    std_tests_strip(b'!@', re.compile(b'!@'))
-    std_tests_strip(b'!@', re.compile(b'!@'), block_size=1)
-
+    null_tests(delimiter_txt, delimiter, **kwargs)
 
-def test_greedy_regex_bin():
-    """Test with greedy character regex delimiter"""
-    std_tests(b't', re.compile(b't+'), eats_run=True)
-    std_tests(b'ttt', re.compile(b't+'), eats_run=True)
-    std_tests(b'tttttt', re.compile(b't+'), eats_run=True)
-    std_tests(b't', re.compile(b't+'), eats_run=True, block_size=1)
-    std_tests(b'ttt', re.compile(b't+'), eats_run=True, block_size=1)
-    std_tests(b'tttttt', re.compile(b't+'), eats_run=True, block_size=1)
+    strip = kwargs.get('strip_delimiter', False)
+    for data, expected in std_cases(delimiter_txt, eats_run, strip):
+        rdr = get_instance(fobj_ctor(data), delimiter, **kwargs)
+        assert_lines(rdr, expected)
 
 
-def test_greedy_regex_bin_strip():
-    """Test with greedy character regex delimiter"""
-    std_tests_strip(b't', re.compile(b't+'), eats_run=True)
-    std_tests_strip(b'ttt', re.compile(b't+'), eats_run=True)
-    std_tests_strip(b'tttttt', re.compile(b't+'), eats_run=True)
-    std_tests_strip(b't', re.compile(b't+'), eats_run=True, block_size=1)
-    std_tests_strip(b'ttt', re.compile(b't+'), eats_run=True, block_size=1)
-    std_tests_strip(b'tttttt', re.compile(b't+'), eats_run=True, block_size=1)
+def std_tests_strip(delimiter_txt, delimiter=None, eats_run=False, **kwargs):
+    """Run standard delimiter tests with stripped delimiters"""
+    kwargs['strip_delimiter'] = True
+    std_tests(delimiter_txt, delimiter, eats_run, **kwargs)
+
+
+# the standard tests as (delimiter_txt, delimiter, eats_run); a delimiter of
+# None is not passed so that the default is used
+STD_CASES = [
+    ('\n', None, False),
+    ('\n', '\n', False),
+    ('~', '~', False),
+    ('!@', '!@', False),
+    (b'\n', b'\n', False),
+    (b'~', b'~', False),
+    (b'!@', b'!@', False),
+    ('~', RE_TILDE_TXT, False),
+    ('!@', RE_BANG_AT_TXT, False),
+    ('t', RE_T_RUN_TXT, True),
+    ('ttt', RE_T_RUN_TXT, True),
+    ('tttttt', RE_T_RUN_TXT, True),
+    (b'~', RE_TILDE_BIN, False),
+    (b'!@', RE_BANG_AT_BIN, False),
+    (b't', RE_T_RUN_BIN, True),
+    (b'ttt', RE_T_RUN_BIN, True),
+    (b'tttttt', RE_T_RUN_BIN, True),
+]
+
+
+@pytest.mark.parametrize('block_size', [None, 1])
+@pytest.mark.parametrize('delimiter_txt,delimiter,eats_run', STD_CASES)
+def test_std(delimiter_txt, delimiter, eats_run, block_size):
+    """Test with each kind of delimiter"""
+    kwargs = {} if block_size is None else {'block_size': block_size}
+    std_tests(delimiter_txt, delimiter, eats_run, **kwargs)
+
+
+@pytest.mark.parametrize('block_size', [None, 1])
+@pytest.mark.parametrize('delimiter_txt,delimiter,eats_run', STD_CASES)
+def test_std_strip(delimiter_txt, delimiter, eats_run, block_size):
+    """Test with each kind of delimiter with stripped delimiters"""
+    kwargs = {} if block_size is None else {'block_size': block_size}
+    std_tests_strip(delimiter_txt, delimiter, eats_run, **kwargs)
+
+
+def run_ops(rdr, ops):
+    """Run a sequence of (operation, argument, expected) steps on a reader
+
+    The operations are 'next' to get the next line, 'peek' to call peek() with
+    the argument, and 'delimiter' to set the delimiter to the argument.
+    """
+    for idx, (operation, argument, expected) in enumerate(ops):
+        if operation == 'next':
+            assert next(rdr) == expected, 'step {}'.format(idx)
+        elif operation == 'peek':
+            assert rdr.peek(argument) == expected, 'step {}'.format(idx)
+        else:
+            rdr.delimiter = argument
+            assert rdr.delimiter is argument, 'step {}'.format(idx)
+
+
+# the streams read by the delimiter override and peek tests
+DELIMITER_DATA = 'abc~def~gh~i!j'
+PEEK_DATA = 'abc~def~gh!i~jkl'
+
+# the steps after the delimiter is changed from '~' to '!' on DELIMITER_DATA
+DELIMITER_OPS = (('next', None, 'gh~i!'), ('next', None, 'j'))
+DELIMITER_OPS_STRIP = (('next', None, 'gh~i'), ('next', None, 'j'))
 
 
 def delimiter_tests(**kwargs):
     """Delimiter override tests"""
-    fobj = io.StringIO('abc~def~gh~i!j')
-    rdr = ReadLines(fobj, delimiter='~', **kwargs)
-    assert next(rdr) == 'abc~'
-    assert next(rdr) == 'def~'
-    rdr.delimiter = '!'
-    assert rdr.delimiter == '!'
-    assert next(rdr) == 'gh~i!'
-    assert next(rdr) == 'j'
-
-    assert fobj.seek(0) == 0
-    rdr = ReadLines(fobj, delimiter='~', **kwargs)
-    assert next(rdr) == 'abc~'
-    assert next(rdr) == 'def~'
-    delimiter = re.compile('!')
-    rdr.delimiter = delimiter
-    assert rdr.delimiter is delimiter
-    assert next(rdr) == 'gh~i!'
-    assert next(rdr) == 'j'
-
-    assert fobj.seek(2) == 2
-    rdr = ReadLines(fobj, delimiter='~', **kwargs)
-    assert next(rdr) == 'c~'
-    assert next(rdr) == 'def~'
-    rdr.delimiter = '!'
-    assert rdr.delimiter == '!'
-    assert next(rdr) == 'gh~i!'
-    assert next(rdr) == 'j'
+    fobj = io.StringIO(DELIMITER_DATA)
+    for start, first, delimiter in ((0, 'abc~', '!'), (0, 'abc~', RE_BANG_TXT),
+                                    (2, 'c~', '!')):
+        assert fobj.seek(start) == start
+        rdr = ReadLines(fobj, delimiter='~', **kwargs)
+        run_ops(rdr, (('next', None, first), ('next', None, 'def~'),
+                      ('delimiter', delimiter, None)) + DELIMITER_OPS)
 
     fobj = io.StringIO('')
     rdr = ReadLines(fobj, delimiter='~', **kwargs)
-    assert rdr.peek() == ''
-    rdr.delimiter = '!'
-    assert rdr.delimiter == '!'
-    assert rdr.peek() == ''
+    run_ops(rdr, (('peek', None, ''), ('delimiter', '!', None),
+                  ('peek', None, '')))
 
 
 def test_delimiter():
@@ -343,23 +227,12 @@ def test_delimiter():
 
 def delimiter_tests_strip(**kwargs):
     """Delimiter override tests with stripped delimiters"""
-    fobj = io.StringIO('abc~def~gh~i!j')
-    rdr = ReadLines(fobj, delimiter='~', strip_delimiter=True, **kwargs)
-    assert next(rdr) == 'abc'
-    assert next(rdr) == 'def'
-    rdr.delimiter = '!'
-    assert rdr.delimiter == '!'
-    assert next(rdr) == 'gh~i'
-    assert next(rdr) == 'j'
-
-    assert fobj.seek(2) == 2
-    rdr = ReadLines(fobj, delimiter='~', strip_delimiter=True, **kwargs)
-    assert next(rdr) == 'c'
-    assert next(rdr) == 'def'
-    rdr.delimiter = '!'
-    assert rdr.delimiter == '!'
-    assert next(rdr) == 'gh~i'
-    assert next(rdr) == 'j'
+    fobj = io.StringIO(DELIMITER_DATA)
+    for start, first in ((0, 'abc'), (2, 'c')):
+        assert fobj.seek(start) == start
+        rdr = ReadLines(fobj, delimiter='~', strip_delimiter=True, **kwargs)
+        run_ops(rdr, (('next', None, first), ('next', None, 'def'),
+                      ('delimiter', '!', None)) + DELIMITER_OPS_STRIP)
 
 
 def test_delimiter_strip():
@@ -368,56 +241,44 @@ def test_delimiter_strip():
     delimiter_tests_strip(block_size=1)
 
 
+# the peek steps on PEEK_DATA upto the line that is peeked at with each
+# delimiter, whether or not that line was peeked at before the delimiter is
+# changed, and the steps after
+PEEK_OPS_HEAD = (('next', None, 'abc~'), ('peek', 0, ''), ('peek', 2, 'de'),
+                 ('peek', None, 'def~'), ('peek', None, 'def~'),
+                 ('next', None, 'def~'))
+PEEK_OPS_PEEKED = (('peek', None, 'gh!i~'),)
+PEEK_OPS_TAIL = (('delimiter', '!', None), ('peek', None, 'gh!'),
+                 ('delimiter', '~', None), ('peek', None, 'gh!i~'),
+                 ('peek', 4, 'gh!i'), ('peek', 20, 'gh!i~jkl'),
+                 ('next', None, 'gh!i~'), ('peek', None, 'jkl'),
+                 ('peek', None, 'jkl'), ('next', None, 'jkl'),
+                 ('peek', None, ''), ('peek', 10, ''))
+
+# the same steps with stripped delimiters on PEEK_DATA with a final delimiter
+PEEK_OPS_HEAD_STRIP = (('next', None, 'abc'), ('peek', 0, ''),
+                       ('peek', 2, 'de'), ('peek', None, 'def'),
+                       ('peek', None, 'def'), ('next', None, 'def'))
+PEEK_OPS_PEEKED_STRIP = (('peek', None, 'gh!i'),)
+PEEK_OPS_TAIL_STRIP = (('delimiter', '!', None), ('peek', None, 'gh'),
+                       ('delimiter', '~', None), ('peek', None, 'gh!i'),
+                       ('peek', 4, 'gh!i'), ('peek', 20, 'gh!i~jkl~'),
+                       ('next', None, 'gh!i'), ('peek', None, 'jkl'),
+                       ('peek', None, 'jkl'), ('next', None, 'jkl'),
+                       ('peek', None, ''), ('peek', 10, ''))
+
+
 def peek_tests(**kwargs):
     """Peek tests"""
-    fobj = io.StringIO('abc~def~gh!i~jkl')
-    rdr = ReadLines(fobj, delimiter='~', **kwargs)
-    assert next(rdr) == 'abc~'
-    assert rdr.peek(0) == ''
-    assert rdr.peek(2) == 'de'
-    assert rdr.peek() == 'def~'
-    assert rdr.peek() == 'def~'
-    assert next(rdr) == 'def~'
-    assert rdr.peek() == 'gh!i~'
-    rdr.delimiter = '!'
-    assert rdr.peek() == 'gh!'
-    rdr.delimiter = '~'
-    assert rdr.peek() == 'gh!i~'
-    assert rdr.peek(4) == 'gh!i'
-    assert rdr.peek(20) == 'gh!i~jkl'
-    assert next(rdr) == 'gh!i~'
-    assert rdr.peek() == 'jkl'
-    assert rdr.peek() == 'jkl'
-    assert next(rdr) == 'jkl'
-    assert rdr.peek() == ''
-    assert rdr.peek(10) == ''
-
-    fobj = io.StringIO('abc~def~gh!i~jkl')
-    rdr = ReadLines(fobj, delimiter='~', **kwargs)
-    assert next(rdr) == 'abc~'
-    assert rdr.peek(0) == ''
-    assert rdr.peek(2) == 'de'
-    assert rdr.peek() == 'def~'
-    assert rdr.peek() == 'def~'
-    assert next(rdr) == 'def~'
-    rdr.delimiter = '!'
-    assert rdr.peek() == 'gh!'
-    rdr.delimiter = '~'
-    assert rdr.peek() == 'gh!i~'
-    assert rdr.peek(4) == 'gh!i'
-    assert rdr.peek(20) == 'gh!i~jkl'
-    assert next(rdr) == 'gh!i~'
-    assert rdr.peek() == 'jkl'
-    assert rdr.peek() == 'jkl'
-    assert next(rdr) == 'jkl'
-    assert rdr.peek() == ''
-    assert rdr.peek(10) == ''
+    fobj = io.StringIO(PEEK_DATA)
+    for peeked in (PEEK_OPS_PEEKED, ()):
+        assert fobj.seek(0) == 0
+        rdr = ReadLines(fobj, delimiter='~', **kwargs)
+        run_ops(rdr, PEEK_OPS_HEAD + peeked + PEEK_OPS_TAIL)
 
     fobj = io.StringIO('')
     rdr = ReadLines(fobj, delimiter='~', **kwargs)
-    assert rdr.peek(0) == ''
-    assert rdr.peek(2) == ''
-    assert rdr.peek() == ''
+    run_ops(rdr, (('peek', 0, ''), ('peek', 2, ''), ('peek', None, '')))
 
 
 def test_peek():
@@ -428,48 +289,11 @@ def test_peek():
 
 def peek_tests_strip(**kwargs):
     """Peek tests with stripped delimiters"""
-    fobj = io.StringIO('abc~def~gh!i~jkl~')
-    rdr = ReadLines(fobj, delimiter='~', strip_delimiter=True, **kwargs)
-    assert next(rdr) == 'abc'
-    assert rdr.peek(0) == ''
-    assert rdr.peek(2) == 'de'
-    assert rdr.peek() == 'def'
-    assert rdr.peek() == 'def'
-    assert next(rdr) == 'def'
-    assert rdr.peek() == 'gh!i'
-    rdr.delimiter = '!'
-    assert rdr.peek() == 'gh'
-    rdr.delimiter = '~'
-    assert rdr.peek() == 'gh!i'
-    assert rdr.peek(4) == 'gh!i'
-    assert rdr.peek(20) == 'gh!i~jkl~'
-    assert next(rdr) == 'gh!i'
-    assert rdr.peek() == 'jkl'
-    assert rdr.peek() == 'jkl'
-    assert next(rdr) == 'jkl'
-    assert rdr.peek() == ''
-    assert rdr.peek(10) == ''
-
-    fobj = io.StringIO('abc~def~gh!i~jkl~')
-    rdr = ReadLines(fobj, delimiter='~', strip_delimiter=True, **kwargs)
-    assert next(rdr) == 'abc'
-    assert rdr.peek(0) == ''
-    assert rdr.peek(2) == 'de'
-    assert rdr.peek() == 'def'
-    assert rdr.peek() == 'def'
-    assert next(rdr) == 'def'
-    rdr.delimiter = '!'
-    assert rdr.peek() == 'gh'
-    rdr.delimiter = '~'
-    assert rdr.peek() == 'gh!i'
-    assert rdr.peek(4) == 'gh!i'
-    assert rdr.peek(20) == 'gh!i~jkl~'
-    assert next(rdr) == 'gh!i'
-    assert rdr.peek() == 'jkl'
-    assert rdr.peek() == 'jkl'
-    assert next(rdr) == 'jkl'
-    assert rdr.peek() == ''
-    assert rdr.peek(10) == ''
+    fobj = io.StringIO(PEEK_DATA + '~')
+    for peeked in (PEEK_OPS_PEEKED_STRIP, ()):
+        assert fobj.seek(0) == 0
+        rdr = ReadLines(fobj, delimiter='~', strip_delimiter=True, **kwargs)
+        run_ops(rdr, PEEK_OPS_HEAD_STRIP + peeked + PEEK_OPS_TAIL_STRIP)
 
 
 def test_peek_strip():
@@ -490,44 +314,26 @@ def test_strip_change():
     assert next(rdr) == 'def~'
 
 
-# pylint: disable=redefined-variable-type
-def test_errors_delimiter_text():
-    """Test delimiter override with an invalid delimiter for a text stream"""
-    fobj = io.StringIO('abc~def~')
-    rdr = ReadLines(fobj, delimiter='~')
-    assert next(rdr) == 'abc~'
-    rdr.delimiter = b'~'
-    with pytest.raises(TypeError):
-        next(rdr)
-    rdr.delimiter = 1
+@pytest.mark.parametrize('data,delimiter,invalid', [
+    ('abc~def~', '~', b'~'),
+    ('abc~def~', '~', 1),
+    ('abc~def~', '~', RE_TILDE_BIN),
+    (b'abc~def~', b'~', '~'),
+    (b'abc~def~', b'~', 1),
+    (b'abc~def~', b'~', RE_TILDE_TXT),
+])
+def test_errors_delimiter(data, delimiter, invalid):
+    """Test delimiter override with an invalid delimiter for the stream"""
+    fobj = io.StringIO(data) if isinstance(data, str) else io.BytesIO(data)
+    rdr = ReadLines(fobj, delimiter=delimiter)
+    assert next(rdr) == data[:4]
+    rdr.delimiter = invalid
     with pytest.raises(TypeError):
         next(rdr)
-    rdr.delimiter = re.compile(b'~')
     with pytest.raises(TypeError):
         next(rdr)
-    rdr.delimiter = '~'
-    assert next(rdr) == 'def~'
-# pylint: enable=redefined-variable-type
-
-
-# pylint: disable=redefined-variable-type
-def test_errors_delimiter_bin():
-    """Test delimiter override with an invalid delimiter for a text stream"""
-    fobj = io.BytesIO(b'abc~def~')
-    rdr = ReadLines(fobj, delimiter=b'~')
-    assert next(rdr) == b'abc~'
-    rdr.delimiter = '~'
-    with pytest.raises(TypeError):
-        next(rdr)
-    rdr.delimiter = 1
-    with pytest.raises(TypeError):
-        next(rdr)
-    rdr.delimiter = re.compile('~')
-    with pytest.raises(TypeError):
-        next(rdr)
-    rdr.delimiter = b'~'
-    assert next(rdr) == b'def~'
-# pylint: enable=redefined-variable-type
+    rdr.delimiter = delimiter
+    assert next(rdr) == data[4:]
 
 
 def test_zero_match_delimiter():
@@ -540,8 +346,247 @@ def test_zero_match_delimiter():
     assert rdr.peek(3) == 'abc'
 
     fobj = io.StringIO('abc~def~')
-    rdr = ReadLines(fobj, delimiter=re.compile('~*'))
+    rdr = ReadLines(fobj, delimiter=RE_TILDE_ANY_TXT)
     assert rdr.peek() == ''
     assert next(rdr) == ''
     assert next(rdr) == ''
     assert rdr.peek(3) == 'abc'
+
+
+def test_binary_type():
+    """Test that a binary stream returns bytes"""
+    fobj = io.BytesIO(b'abc~def~ghi')
+    rdr = ReadLines(fobj, delimiter=b'~', block_size=2)
+    assert type(rdr.peek()) is bytes  # pylint: disable=unidiomatic-typecheck
+    assert type(rdr.peek(5)) is bytes # pylint: disable=unidiomatic-typecheck
+    assert [type(line) for line in rdr] == [bytes] * 3
+
+
+def test_count_remaining():
+    """Test counting the remaining lines"""
+    for data, delimiter in (('', '~'), ('~', '~'), ('abc', '~'),
+                            ('abc~def~~ghi', '~'), ('~abc~def~', '~'),
+                            ('a!@b!!@@c!@', '!@'), ('aaaaa', 'aa'),
+                            ('abaababa', 'aba'), ('abc\ndef\n', '\n'),
+                            ('abc~def~', RE_TILDE_TXT),
+                            ('abtttcdtef', RE_T_RUN_TXT)):
+        for kwargs in ({}, {'block_size': 1}, {'block_size': 2}):
+            for skip in range(3):
+                expected = list(ReadLines(io.StringIO(data),
+                                          delimiter=delimiter, **kwargs))
+                rdr = ReadLines(io.StringIO(data), delimiter=delimiter,
+                                **kwargs)
+                for _ in range(skip):
+                    next(rdr, None)
+                assert rdr.count_remaining() == len(expected[skip:])
+                assert list(rdr) == []
+
+                bin_delimiter = delimiter.encode('utf-8') \
+                                if isinstance(delimiter, str) else \
+                                re.compile(delimiter.pattern.encode('utf-8'))
+                rdr = ReadLines(io.BytesIO(data.encode('utf-8')),
+                                delimiter=bin_delimiter, **kwargs)
+                for _ in range(skip):
+                    next(rdr, None)
+                assert rdr.count_remaining() == len(expected[skip:])
+                assert list(rdr) == []
+
+
+def test_weakref():
+    """Test that a reader can be weakly referenced"""
+    rdr = ReadLines(io.StringIO('abc'))
+    ref = weakref.ref(rdr)
+    assert ref() is rdr
+    del rdr
+    gc.collect()
+    assert ref() is None
+
+
+def test_prefetch():
+    """Test reading ahead in a background thread"""
+    std_tests('\n', prefetch=True)
+    std_tests('\n', prefetch=True, block_size=1)
+    std_tests_strip(b'!@', b'!@', prefetch=True, block_size=1)
+    std_tests('t', RE_T_RUN_TXT, eats_run=True, prefetch=True,
+              block_size=1)
+    peek_tests(prefetch=True)
+    peek_tests(prefetch=True, block_size=1)
+
+
+def test_pipe_read_size():
+    """Test that a long line from a pipe is read a block at a time"""
+    read_fd, write_fd = os.pipe()
+    with open(read_fd, encoding='ascii') as fobj, \
+            open(write_fd, 'w', encoding='ascii') as writer:
+        writer.write('abcdefghijk~')
+        writer.flush()
+        lines = []
+        rdr = ReadLines(fobj, delimiter='~', block_size=4)
+        thread = threading.Thread(target=lambda: lines.append(next(rdr)),
+                                  daemon=True)
+        thread.start()
+        thread.join(5)
+        assert lines == ['abcdefghijk~']
+
+
+class FailingIO(io.StringIO):
+    """Stream that fails after the first read"""
+    def read(self, *args):
+        if self.tell():
+            raise OSError('read failed')
+        return super().read(*args)
+
+
+def test_prefetch_error():
+    """Test that a read error is raised in the consuming thread"""
+    rdr = ReadLines(FailingIO('abc~def'), delimiter='~', block_size=2,
+                    prefetch=True)
+    with pytest.raises(OSError):
+        next(rdr)
+    with pytest.raises(OSError):
+        next(rdr)
+
+
+def test_prefetch_abandoned():
+    """Test that the thread stops once a prefetching reader is dropped"""
+    before = set(threading.enumerate())
+    rdr = ReadLines(io.StringIO('abc~' * 100), delimiter='~', block_size=4,
+                    prefetch=True)
+    assert next(rdr) == 'abc~'
+    threads = set(threading.enumerate()) - before
+    assert len(threads) == 1
+    del rdr
+    gc.collect()
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive()
+
+
+class ReadOnlyIO:                       # pylint: disable=too-few-public-methods
+    """Binary stream that only provides read()"""
+    def read(self, size):
+        """Read upto *size* bytes"""
+        return self._fobj.read(size)
+
+    def __init__(self, data):
+        self._fobj = io.BytesIO(data)
+
+
+def test_binary_read_only():
+    """Test a binary stream without readinto()"""
+    rdr = ReadLines(ReadOnlyIO(b'abc~def~ghi'), delimiter=b'~', block_size=2)
+    assert rdr.peek(5) == b'abc~d'
+    assert list(rdr) == [b'abc~', b'def~', b'ghi']
+
+
+def traced_size(func):
+    """Call *func* and get its result and the memory still allocated after"""
+    tracemalloc.start()
+    try:
+        result = func()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def test_binary_read_buffer_size():
+    """Test that the reused read buffer is only held while it is needed"""
+    block_size = 1 << 18
+
+    # a stream smaller than a block never allocates the buffer
+    rdr, size = traced_size(lambda: ReadLines(io.BytesIO(b'abc~def~'),
+                                              delimiter=b'~',
+                                              block_size=block_size))
+    assert size < block_size
+    assert list(rdr) == [b'abc~', b'def~']
+
+    # the buffer is released once the stream is exhausted
+    fobj = io.BytesIO((b'x' * 1023 + b'~') * 512)
+
+    def exhaust():
+        rdr = ReadLines(fobj, delimiter=b'~', block_size=block_size)
+        assert sum(1 for _ in rdr) == 512
+        return rdr
+    rdr, size = traced_size(exhaust)
+    assert size < block_size * 3 // 2
+
+
+class NonBlockingIO(io.RawIOBase):
+    """Raw stream that has no more data available after its first read"""
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._data is None:
+            return None
+        amount = len(self._data)
+        buffer[:amount] = self._data
+        self._data = None
+        return amount
+
+    def __init__(self, data):
+        super().__init__()
+        self._data = data
+
+
+def test_binary_non_blocking():
+    """Test a stream whose readinto() reports that no data is available"""
+    rdr = ReadLines(NonBlockingIO(b'abc~de'), delimiter=b'~', block_size=6)
+    assert next(rdr) == b'abc~'
+    with pytest.raises(BlockingIOError):
+        next(rdr)
+
+
+def test_binary_interleaved():
+    """Test streams read one after the other and interleaved"""
+    for _ in range(3):
+        rdr = ReadLines(io.BytesIO(b'abc~def~ghi'), delimiter=b'~',
+                        block_size=4)
+        assert list(rdr) == [b'abc~', b'def~', b'ghi']
+        assert list(rdr) == []
+
+    rdr1 = ReadLines(io.BytesIO(b'abc~def~ghi'), delimiter=b'~', block_size=4)
+    assert next(rdr1) == b'abc~'
+    rdr2 = ReadLines(io.BytesIO(b'jkl~mno'), delimiter=b'~', block_size=4)
+    assert list(rdr2) == [b'jkl~', b'mno']
+    rdr3 = ReadLines(io.BytesIO(b'pqr~stu'), delimiter=b'~', block_size=4)
+    assert list(rdr1) == [b'def~', b'ghi']
+    assert list(rdr3) == [b'pqr~', b'stu']
+
+
+def test_literal_special_characters():
+    """Test multiple character delimiters holding regex special characters"""
+    rdr = get_instance(io.StringIO('a.*b+.*.*c'), '.*', block_size=3)
+    assert list(rdr) == ['a.*', 'b+.*', '.*', 'c']
+    rdr = get_instance(io.BytesIO(b'a|b||c('), b'||', block_size=2)
+    assert list(rdr) == [b'a|b||', b'c(']
+
+
+def test_iter_lines():
+    """Test that iter_lines() returns the same lines as ReadLines"""
+    tests = (('abc~def~~ghi~~~', '~'),
+             ('abc~def~~ghi~~~', '~~'),
+             ('abc~def~~ghi~~~', RE_TILDE_RUN_TXT),
+             ('~abc\r\ndef\r\r\n', '\r\n'),
+             ('~abc\r\ndef\r\r\nghi', '\n'))
+    for data, delimiter in tests:
+        if isinstance(delimiter, str):
+            delimiter_bin = delimiter.encode()
+        else:
+            delimiter_bin = re.compile(delimiter.pattern.encode())
+        for fobj, delim in ((io.StringIO(data), delimiter),
+                            (io.BytesIO(data.encode()), delimiter_bin)):
+            for block_size in (1, 2, 3, 5, 100):
+                for strip in (False, True):
+                    fobj.seek(0)
+                    expected = list(ReadLines(fobj, delimiter=delim,
+                                              strip_delimiter=strip,
+                                              block_size=block_size))
+                    fobj.seek(0)
+                    assert list(iter_lines(fobj, delimiter=delim,
+                                           strip_delimiter=strip,
+                                           block_size=block_size)) == expected
+
+    lines = iter_lines(io.StringIO('abc~def~'), delimiter='')
+    assert next(lines) == ''
+    assert next(lines) == ''